@@ -15,19 +15,74 @@ class Utterance:
     timestamp: int
     speaker: str
     text: str
+    revision: Optional[int] = None
 
     @classmethod
     def for_chat(cls, chat_id: str, speaker: str, timestamp: int, text: str, id: str = None):
         return cls(chat_id, None, id if id else str(uuid.uuid4()), timestamp, speaker, text)
 
 
+@dataclass
+class UtteranceDelta:
+    """
+    Change of an utterance in a chat.
+
+    The text of the utterance after the change is the text before the change up to offset, followed by the text
+    of the delta.
+    """
+    chat_id: str
+    revision: int
+    sequence: int
+    id: str
+    timestamp: int
+    speaker: str
+    offset: int
+    text: str
+
+
 class Chats(abc.ABC):
     def append(self, utterances: Union[Utterance, Iterable[Utterance]], modify_timestamp: bool = True):
         raise NotImplementedError("")
 
+    def update(self, utterance: Utterance, replace: bool = False, create: bool = True) -> Optional[Utterance]:
+        """
+        Update the text of an utterance in place, without modifying the timestamp of the chat.
+
+        Parameters
+        ----------
+        utterance : Utterance
+            utterance with the id of the utterance to update and the text to add
+        replace : bool
+            Replace the text of the utterance instead of appending to it
+        create : bool
+            Append the utterance to the chat if there is no utterance with its id yet
+
+        Returns
+        -------
+        utterance : Optional[Utterance]
+            the updated utterance, None if no utterance was updated or created
+        """
+        raise NotImplementedError("")
+
     def get_utterances(self, chat_id: str, from_sequence: int = 0):
         raise NotImplementedError("")
 
+    def get_updates(self, chat_id: str, from_revision: int = 0) -> Iterable[UtteranceDelta]:
+        """
+        Parameters
+        ----------
+        chat_id : str
+            chat id
+        from_revision : int
+            Return changes made after this revision of the chat
+
+        Returns
+        -------
+        deltas : Iterable[UtteranceDelta]
+            changes to the utterances in the chat, ordered by revision
+        """
+        raise NotImplementedError("")
+
     def current_chat(self, create: bool, modify_timestamp: bool = False) -> (Optional[str], bool, Optional[int]):
         """
         Parameters
@@ -50,4 +105,33 @@ class Chats(abc.ABC):
 
     def stop_chat(self):
         """Stop the current chat id"""
+        raise NotImplementedError("")
+
+    def expire_chat(self, chat_id: str, timeout: int, stop: bool = False) -> (bool, Optional[int]):
+        """
+        Expire the chat if it is the current chat and was not modified within the timeout.
+
+        An expired chat releases its utterances but remains the current chat until it is stopped, it does not accept
+        new utterances and its timestamp is not modified anymore.
+
+        Parameters
+        ----------
+        chat_id : str
+            chat id to expire
+        timeout : int
+            timeout in milliseconds since the last modification
+        stop : bool
+            Stop the chat instead of keeping it as expired current chat
+
+        Returns
+        -------
+        expired : bool
+            True if the chat expired
+        deadline : Optional[int]
+            timestamp at which the chat times out if it is still active, may be None
+        """
+        raise NotImplementedError("")
+
+    def is_expired(self, chat_id: str) -> bool:
+        """Check if the chat id is the current chat and expired"""
         raise NotImplementedError("")
\ No newline at end of file
@@ -5,19 +5,21 @@ from typing import Iterable, Union, Optional
 
 from cltl.combot.infra.time_util import timestamp_now
 
-from cltl.chatui.api import Chats, Utterance
+from cltl.chatui.api import Chats, Utterance, UtteranceDelta
 
 logger = logging.getLogger(__name__)
 
 
 class MemoryChats(Chats):
     def __init__(self):
-        self._utterances = set()
+        self._utterances = dict()
         self._chats = dict()
+        self._updates = dict()
         self._chat_id = None
         self._lock = Lock()
 
         self._last_modified = None
+        self._expired = False
 
     def append(self, utterances: Union[Utterance, Iterable[Utterance]], modify_timestamp: bool = True):
         if isinstance(utterances, Utterance):
@@ -25,16 +27,54 @@ class MemoryChats(Chats):
 
         with self._lock:
             for utterance in filter(lambda u: u.id not in self._utterances, utterances):
-                if not self._chat_id == utterance.chat_id:
-                    raise ValueError("Chat IDs don't match: " + str(self._chat_id) + " - " + str(utterance.chat_id))
-
-                utterance.sequence = len(self._chats[utterance.chat_id])
-                self._chats[utterance.chat_id].append(utterance)
-                self._utterances.add(utterance.id)
+                self._add(utterance)
                 if modify_timestamp:
                     self._last_modified = max(self._last_modified if self._last_modified else 0, utterance.timestamp if utterance.timestamp else 0)
                 logger.debug("Added utterance %s [%s] to chat %s [%s]", utterance.id, utterance.text, utterance.chat_id, utterance.sequence)
 
+    def update(self, utterance: Utterance, replace: bool = False, create: bool = True) -> Optional[Utterance]:
+        with self._lock:
+            if utterance.id not in self._utterances:
+                if not create:
+                    return None
+
+                self._add(utterance)
+                logger.debug("Added partial utterance %s to chat %s [%s]", utterance.id, utterance.chat_id, utterance.sequence)
+
+                return utterance
+
+            current = self._utterances[utterance.id]
+            if not self._chat_id == current.chat_id:
+                raise ValueError("Chat IDs don't match: " + str(self._chat_id) + " - " + str(current.chat_id))
+
+            offset = 0 if replace else len(current.text)
+            current.text = current.text[:offset] + utterance.text
+            self._add_delta(current, offset, utterance.text, collapse=replace)
+            logger.debug("Updated utterance %s in chat %s [%s] to revision %s",
+                         current.id, current.chat_id, current.sequence, current.revision)
+
+            return current
+
+    def _add(self, utterance: Utterance):
+        if self._expired:
+            raise ValueError("Chat expired: " + str(self._chat_id))
+        if not self._chat_id == utterance.chat_id:
+            raise ValueError("Chat IDs don't match: " + str(self._chat_id) + " - " + str(utterance.chat_id))
+
+        utterance.sequence = len(self._chats[utterance.chat_id])
+        self._chats[utterance.chat_id].append(utterance)
+        self._utterances[utterance.id] = utterance
+        self._add_delta(utterance, 0, utterance.text)
+
+    def _add_delta(self, utterance: Utterance, offset: int, text: str, collapse: bool = False):
+        updates = self._updates[utterance.chat_id]
+        utterance.revision = updates[-1].revision + 1 if updates else 1
+        if collapse:
+            # The new delta contains the full text, earlier deltas of the utterance are obsolete
+            updates[:] = [delta for delta in updates if delta.id != utterance.id]
+        updates.append(UtteranceDelta(utterance.chat_id, utterance.revision, utterance.sequence, utterance.id,
+                                      utterance.timestamp, utterance.speaker, offset, text))
+
     def get_utterances(self, chat_id: str, from_sequence: int = 0) -> Iterable[Utterance]:
         with self._lock:
             if chat_id not in self._chats:
@@ -42,10 +82,57 @@ class MemoryChats(Chats):
 
             return self._chats[chat_id][from_sequence:]
 
+    def get_updates(self, chat_id: str, from_revision: int = 0) -> Iterable[UtteranceDelta]:
+        with self._lock:
+            if chat_id not in self._updates:
+                raise ValueError("No chat with id " + chat_id)
+
+            updates = self._updates[chat_id]
+            # Revisions are increasing but not contiguous after deltas were collapsed
+            start = len(updates)
+            while start > 0 and updates[start - 1].revision > from_revision:
+                start -= 1
+
+            return updates[start:]
+
     def stop_chat(self):
         with self._lock:
-            self._chat_id = None
-            self._last_modified = None
+            self._stop_chat()
+
+    def expire_chat(self, chat_id: str, timeout: int, stop: bool = False) -> (bool, Optional[int]):
+        with self._lock:
+            if chat_id != self._chat_id or self._expired or self._last_modified is None:
+                return False, None
+
+            deadline = self._last_modified + timeout
+            if deadline > timestamp_now():
+                return False, deadline
+
+            if stop:
+                self._stop_chat()
+            else:
+                self._release_chat()
+                self._expired = True
+
+            return True, None
+
+    def is_expired(self, chat_id: str) -> bool:
+        with self._lock:
+            return self._expired and chat_id is not None and chat_id == self._chat_id
+
+    def _stop_chat(self):
+        self._release_chat()
+
+        self._chat_id = None
+        self._last_modified = None
+        self._expired = False
+
+    def _release_chat(self):
+        if self._chat_id in self._chats:
+            for utterance in self._chats.pop(self._chat_id):
+                del self._utterances[utterance.id]
+            del self._updates[self._chat_id]
+            logger.debug("Released chat %s", self._chat_id)
 
     def current_chat(self, create: bool, modify_timestamp: bool = False) -> (Optional[str], bool, Optional[int]):
         with self._lock:
@@ -55,8 +142,9 @@ class MemoryChats(Chats):
             if is_new:
                 self._chat_id = str(uuid.uuid4())
                 self._chats[self._chat_id] = []
+                self._updates[self._chat_id] = []
 
-            if self._chat_id and modify_timestamp:
+            if self._chat_id and not self._expired and modify_timestamp:
                 self._last_modified = max(self._last_modified if self._last_modified else 0, timestamp_now())
 
             return self._chat_id, is_new, last_modified
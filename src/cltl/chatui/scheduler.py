@@ -0,0 +1,109 @@
+import heapq
+import logging
+from threading import Condition, Thread
+from typing import Callable, Optional
+
+from cltl.combot.infra.time_util import timestamp_now
+
+logger = logging.getLogger(__name__)
+
+
+class ExpiryScheduler:
+    """
+    Background scheduler that invokes a callback when the deadline of a key is reached.
+
+    Deadlines are kept in a heap, with at most one pending deadline per key. Scheduling a later deadline for
+    a key that is already pending is a no-op, extensions are handled lazily by the callback: it is invoked
+    with the key once the pending deadline is reached and may return a new deadline to reschedule the key,
+    or None to drop it.
+
+    Deadlines are compared to the timestamps returned by clock, which defaults to the current time in milliseconds.
+    """
+    def __init__(self, callback: Callable[[str], Optional[int]], name: str = None,
+                 clock: Callable[[], int] = timestamp_now):
+        self._callback = callback
+        self._name = name if name else self.__class__.__name__
+        self._clock = clock
+
+        self._deadlines = []
+        self._pending = dict()
+        self._condition = Condition()
+
+        self._thread = None
+        self._running = False
+
+    def schedule(self, key: str, deadline: int):
+        """
+        Parameters
+        ----------
+        key : str
+            Key passed to the callback when the deadline is reached
+        deadline : int
+            Timestamp in milliseconds
+        """
+        with self._condition:
+            if key in self._pending and self._pending[key] <= deadline:
+                return
+
+            self._pending[key] = deadline
+            heapq.heappush(self._deadlines, (deadline, key))
+            self._condition.notify()
+
+    def start(self):
+        with self._condition:
+            if self._running:
+                return
+            self._running = True
+
+        self._thread = Thread(target=self._run, name=self._name, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        with self._condition:
+            if not self._running:
+                return
+            self._running = False
+            self._condition.notify()
+
+        self._thread.join()
+        self._thread = None
+
+    def _run(self):
+        while True:
+            with self._condition:
+                key = self._await_next()
+                if key is None:
+                    return
+
+            try:
+                deadline = self._callback(key)
+            except Exception:
+                logger.exception("Failed to process deadline for %s", key)
+                deadline = None
+
+            if deadline is not None:
+                self.schedule(key, deadline)
+
+    def _await_next(self) -> Optional[str]:
+        while self._running:
+            if not self._deadlines:
+                self._condition.wait()
+                continue
+
+            deadline, key = self._deadlines[0]
+            if self._pending.get(key) != deadline:
+                # Superseded by an earlier deadline for the same key
+                heapq.heappop(self._deadlines)
+                continue
+
+            remaining = deadline - self._clock()
+            if remaining > 0:
+                self._condition.wait(remaining / 1000)
+                continue
+
+            heapq.heappop(self._deadlines)
+            del self._pending[key]
+
+            return key
+
+        return None
@@ -0,0 +1,17 @@
+from dataclasses import dataclass
+
+from cltl.combot.event.emissor import SignalEvent
+from emissor.representation.scenario import Modality, TextSignal
+
+
+@dataclass
+class TextSignalChunkEvent(SignalEvent[TextSignal]):
+    """
+    Partial text of a response that is still being generated.
+
+    Chunks of the same response share the signal id and carry only the text that was added since the previous
+    chunk. A TextSignalEvent with the same signal id completes the response and replaces the streamed text.
+    """
+    @classmethod
+    def create(cls, signal: TextSignal):
+        return cls(cls.__name__, Modality.TEXT, signal)
@@ -1,4 +1,5 @@
 import logging
+from typing import Optional
 
 import flask
 import math
@@ -14,10 +15,14 @@ from flask import Response
 from flask import jsonify, request, make_response
 
 from cltl.chatui.api import Chats, Utterance
+from cltl.chatui.scheduler import ExpiryScheduler
+from cltl_service.chatui.schema import TextSignalChunkEvent
 
 logger = logging.getLogger(__name__)
 
 _SPEAKER_COOKIE = "cltl.chatui.chatid"
+# Interval in milliseconds to repeat the quit desire for an expired chat until the scenario is stopped
+_EXPIRED_RETRY = 60000
 
 
 class ChatUiService:
@@ -62,6 +67,8 @@ class ChatUiService:
 
         self._timeout = timeout * 60000 if timeout > 0 else 0
         self._use_cookie = timeout > 0
+        self._expiry_scheduler = ExpiryScheduler(self._expire_chat, name=f"{self.__class__.__name__}-expiry") \
+            if self._use_cookie else None
 
     def start(self, timeout=30):
         self._topic_worker = TopicWorker([self._utterance_topic, self._scenario_topic] + self._response_topics,
@@ -70,10 +77,16 @@ class ChatUiService:
                                          name=self.__class__.__name__)
         self._topic_worker.start().wait()
 
+        if self._expiry_scheduler:
+            self._expiry_scheduler.start()
+
     def stop(self):
         if not self._topic_worker:
             return
 
+        if self._expiry_scheduler:
+            self._expiry_scheduler.stop()
+
         self._topic_worker.stop()
         self._topic_worker.await_stop()
         self._topic_worker = None
@@ -104,10 +117,6 @@ class ChatUiService:
                 id_, _, _ = self._chats.current_chat(True, True)
                 status, chat_id, remain_until_timeout = 200, id_, self._timeout
 
-            if remain_until_timeout < 0 and self._desire_topic:
-                logger.debug("Chat %s timed out in UI", self._chats.current_chat(False)[0])
-                self._event_bus.publish(self._desire_topic, Event.for_payload(DesireEvent(['quit'])))
-
             if status == 200:
                 agent_name = self._agent.name if self._agent and self._agent.name else "Leolani"
                 payload = {"id": chat_id, "agent": agent_name}
@@ -131,6 +140,12 @@ class ChatUiService:
                 # Chat is created by speaker
                 logger.debug("Started new chat by speaker: %s", chat_id)
                 status = 200
+            elif self._chats.is_expired(chat_id):
+                # Chat timed out, but the scenario is not stopped yet
+                logger.debug("Rejected cookie %s for expired chat %s", expected, chat_id)
+                remain_until_timeout = _EXPIRED_RETRY / 60000
+                status = 307
+                chat_id = None
             elif last_modified is None:
                 # Chat was created by agent, but no speaker connected yet
                 logger.debug("Accepted new cookie: %s", chat_id)
@@ -150,11 +165,38 @@ class ChatUiService:
             if status == 200:
                 # Reset timeout if cookie is accepted
                 self._chats.current_chat(False, True)
+                self._schedule_expiry(chat_id)
 
             return status, chat_id, remain_until_timeout
 
         @self._app.route('/chat/<chat_id>', methods=['GET', 'POST'])
         def utterances(chat_id: str):
+            invalid = check_chat_id(chat_id)
+            if invalid:
+                return invalid
+
+            if flask.request.method == 'GET':
+                return get_utterances(chat_id)
+            if flask.request.method == 'POST':
+                return post_utterances(chat_id)
+
+        @self._app.route('/chat/<chat_id>/updates', methods=['GET'])
+        def updates(chat_id: str):
+            invalid = check_chat_id(chat_id)
+            if invalid:
+                return invalid
+
+            from_revision = flask.request.args.get('revision', default=0, type=int)
+            speaker = get_speaker_filter()
+            try:
+                deltas = self._chats.get_updates(chat_id, from_revision=from_revision)
+                responses = [delta for delta in deltas if not speaker or delta.speaker == speaker]
+
+                return jsonify(responses)
+            except ValueError:
+                return Response(status=404)
+
+        def check_chat_id(chat_id: str):
             if not chat_id:
                 logger.debug("Request with missing chat id")
                 return Response("Missing chat id", status=400)
@@ -163,19 +205,26 @@ class ChatUiService:
             if chat_id != current_chat:
                 logger.debug("Request with wrong chat id: %s, current: %s", chat_id, current_chat)
                 return Response("Chat unavailable", status=404)
+            if self._chats.is_expired(chat_id):
+                logger.debug("Request for expired chat: %s", chat_id)
+                return Response("Chat expired", status=404)
 
-            if flask.request.method == 'GET':
-                return get_utterances(chat_id)
-            if flask.request.method == 'POST':
-                return post_utterances(chat_id)
+            return None
+
+        def get_speaker_filter():
+            agent_name = self._agent.name if self._agent and self._agent.name else "Leolani"
+            return flask.request.args.get('speaker', default=None if self._external_input else agent_name, type=str)
 
         def get_utterances(chat_id: str):
+            # Utterances are returned with their current text. Streamed utterances are updated in place and not
+            # returned again for a later sequence, poll with 'revision' or use /chat/<chat_id>/updates to follow them.
             from_sequence = flask.request.args.get('from', default=0, type=int)
-            agent_name = self._agent.name if self._agent and self._agent.name else "Leolani"
-            speaker = flask.request.args.get('speaker', default=None if self._external_input else agent_name, type=str)
+            from_revision = flask.request.args.get('revision', default=0, type=int)
+            speaker = get_speaker_filter()
             try:
                 utterances = self._chats.get_utterances(chat_id, from_sequence=from_sequence)
-                responses = [utterance for utterance in utterances if not speaker or utterance.speaker == speaker]
+                responses = [utterance for utterance in utterances
+                             if (not speaker or utterance.speaker == speaker) and utterance.revision > from_revision]
 
                 return jsonify(responses)
             except ValueError:
@@ -185,7 +234,13 @@ class ChatUiService:
             speaker = flask.request.args.get('speaker', default=None, type=str)
             text = flask.request.get_data(as_text=True)
             utterance = Utterance.for_chat(chat_id, speaker, timestamp_now(), text)
-            self._chats.append(utterance)
+            try:
+                self._chats.append(utterance)
+            except ValueError:
+                # Chat expired or stopped after the chat id was checked
+                logger.debug("Rejected utterance for unavailable chat %s", chat_id)
+                return Response("Chat unavailable", status=404)
+            self._schedule_expiry(chat_id)
             payload = self._create_payload(utterance)
             self._event_bus.publish(self._utterance_topic, Event.for_payload(payload))
 
@@ -222,17 +277,54 @@ class ChatUiService:
         chat_id, is_new, last_modified = self._chats.current_chat(True)
         if is_new:
             logger.debug("Started new chat by agent: %s", chat_id)
+        if self._chats.is_expired(chat_id):
+            logger.debug("Ignored event on %s for expired chat %s", event.metadata.topic, chat_id)
+            return
 
-        if event.metadata.topic in self._response_topics:
-            agent_name = self._agent.name if self._agent and self._agent.name else "Leolani"
-            response = Utterance.for_chat(chat_id, agent_name, event.payload.signal.time.start,
-                                          event.payload.signal.text)
+        try:
+            if event.metadata.topic in self._response_topics:
+                self._process_response(chat_id, event)
+            elif event.metadata.topic == self._utterance_topic:
+                speaker_name = self._speaker.name if self._speaker and self._speaker.name else "Stranger"
+                utterance = Utterance.for_chat(chat_id, speaker_name, event.payload.signal.time.start,
+                                               event.payload.signal.text, id=event.payload.signal.id)
+                self._chats.append(utterance)
+                self._schedule_expiry(chat_id)
+        except ValueError as e:
+            # Chat expired or stopped while the event was processed
+            logger.warning("Dropped event %s on %s for chat %s: %s", event.id, event.metadata.topic, chat_id, e)
+
+    def _process_response(self, chat_id: str, event: Event):
+        agent_name = self._agent.name if self._agent and self._agent.name else "Leolani"
+        signal = event.payload.signal
+        streamed = Utterance.for_chat(chat_id, agent_name, signal.time.start, signal.text, id=signal.id)
+
+        if event.payload.type == TextSignalChunkEvent.__name__:
+            self._chats.update(streamed)
+        elif not self._chats.update(streamed, replace=True, create=False):
+            response = Utterance.for_chat(chat_id, agent_name, signal.time.start, signal.text)
             self._chats.append(response, modify_timestamp=False)
-        elif event.metadata.topic == self._utterance_topic:
-            speaker_name = self._speaker.name if self._speaker and self._speaker.name else "Stranger"
-            utterance = Utterance.for_chat(chat_id, speaker_name, event.payload.signal.time.start,
-                                           event.payload.signal.text, id=event.payload.signal.id)
-            self._chats.append(utterance)
+
+    def _schedule_expiry(self, chat_id: str):
+        if self._expiry_scheduler:
+            self._expiry_scheduler.schedule(chat_id, timestamp_now() + self._timeout)
+
+    def _expire_chat(self, chat_id: str) -> Optional[int]:
+        if self._chats.is_expired(chat_id):
+            logger.warning("Expired chat %s was not stopped, repeat quit desire", chat_id)
+        else:
+            # Without desire topic the scenario is not stopped, release the chat right away
+            expired, deadline = self._chats.expire_chat(chat_id, self._timeout, stop=not self._desire_topic)
+            if not expired:
+                return deadline
+            logger.debug("Chat %s timed out in UI", chat_id)
+            if not self._desire_topic:
+                return None
+
+        self._event_bus.publish(self._desire_topic, Event.for_payload(DesireEvent(['quit'])))
+
+        # Repeat until the scenario is stopped
+        return timestamp_now() + _EXPIRED_RETRY
 
     def _process_scenario_event(self, event):
         self._scenario_id = event.payload.scenario.id
@@ -6,8 +6,11 @@ $(document).ready(function() {
     var agentId = false;
     var chatId = false;
     var turn = 0;
-    var chatSequence = Number.MIN_SAFE_INTEGER;
+    var chatRevision = 0;
     var utteranceIds = new Set();
+    // Text of displayed utterances that can still be updated, and those not rendered yet
+    var utteranceTexts = new Map();
+    var staleUtterances = new Set();
 
     let chatWindow = new Bubbles(
         document.getElementById("chat"),
@@ -40,7 +43,7 @@ $(document).ready(function() {
         setTimeout(poll, pollInterval + (animationTime || 100));
     };
 
-    let talk = function(utterances) {
+    let talk = function(deltas) {
         if (!chatId) {
             // Not initialized yet
             setTimeout(poll, pollInterval + (animationTime || 0));
@@ -49,9 +52,14 @@ $(document).ready(function() {
 
         var convos;
         try {
-            let newUtterances = utterances.filter(utterance => !utteranceIds.has(utterance.id) && utterance.text);
-            newUtterances.forEach(utterance => utteranceIds.add(utterance.id));
-            chatSequence = Math.max(...utterances.map(utt => utt.sequence), chatSequence);
+            chatRevision = Math.max(...deltas.map(delta => delta.revision), chatRevision);
+
+            let newUtterances = applyDeltas(deltas);
+            newUtterances.forEach(utterance => {
+                utteranceIds.add(utterance.id);
+                utteranceTexts.set(utterance.id, utterance.text);
+            });
+            renderUpdates();
 
             let turns = groupTurns(newUtterances);
             convos = turns.map(toConversationObjects);
@@ -65,6 +73,43 @@ $(document).ready(function() {
         }
     }
 
+    let applyDeltas = function (deltas) {
+        let newUtterances = new Map();
+        deltas.forEach(delta => {
+            if (newUtterances.has(delta.id)) {
+                let utterance = newUtterances.get(delta.id);
+                utterance.text = utterance.text.slice(0, delta.offset) + delta.text;
+            } else if (utteranceTexts.has(delta.id)) {
+                utteranceTexts.set(delta.id, utteranceTexts.get(delta.id).slice(0, delta.offset) + delta.text);
+                staleUtterances.add(delta.id);
+            } else if (!utteranceIds.has(delta.id)) {
+                newUtterances.set(delta.id, {
+                    id: delta.id,
+                    sequence: delta.sequence,
+                    timestamp: delta.timestamp,
+                    speaker: delta.speaker,
+                    text: delta.text
+                });
+            }
+        });
+
+        return Array.from(newUtterances.values()).filter(utterance => utterance.text);
+    };
+
+    let renderUpdates = function () {
+        staleUtterances.forEach(id => {
+            let element = $("[data-utterance]").filter((i, span) => span.dataset.utterance === id);
+            if (element.length) {
+                element.text(utteranceTexts.get(id));
+                staleUtterances.delete(id);
+            }
+        });
+    };
+
+    let escapeHtml = function (text) {
+        return $("<span>").text(text).html().replace(/"/g, "&quot;");
+    };
+
     let groupTurns = function (utterances) {
         utterances.sort((a, b) => a.timestamp - b.timestamp);
         let turnAggregator = function(turns, utterance) {
@@ -89,8 +134,8 @@ $(document).ready(function() {
         // The Chat UI accepts blocks of agent utterances - user utterances.
         // Agent utterances are submitted as text array in 'says'
         // User utterances are submitted as question-answer replies
-        let agent = currentTurn.agent.map(utt => `${utt.speaker}> ${utt.text}`);
-        let other = currentTurn.other.map(utt => `${utt.speaker}> ${utt.text}`).join(" |");
+        let agent = currentTurn.agent.map(utt => `${escapeHtml(utt.speaker)}> <span data-utterance="${escapeHtml(utt.id)}">${escapeHtml(utt.text)}</span>`);
+        let other = currentTurn.other.map(utt => `${escapeHtml(utt.speaker)}> ${escapeHtml(utt.text)}`).join(" |");
 
         convo = {}
         convo[turn] = {
@@ -107,7 +152,7 @@ $(document).ready(function() {
             return;
         }
 
-        $.get(restPath + "/chat/" + chatId + "?from=" + (chatSequence  + 1))
+        $.get(restPath + "/chat/" + chatId + "/updates?revision=" + chatRevision)
             .done(talk)
             .fail(jqXHR => {
                 if (jqXHR.status === 404) {
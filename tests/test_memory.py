@@ -0,0 +1,133 @@
+import unittest
+
+from cltl.combot.infra.time_util import timestamp_now
+
+from cltl.chatui.api import Utterance
+from cltl.chatui.memory import MemoryChats
+
+
+class MemoryChatsExpiryTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.chats = MemoryChats()
+        self.chat_id, _, _ = self.chats.current_chat(True, True)
+        self.chats.append(Utterance.for_chat(self.chat_id, "speaker", timestamp_now(), "bla bla bla"))
+
+    def test_expire_chat_before_deadline(self):
+        _, _, last_modified = self.chats.current_chat(False)
+
+        expired, deadline = self.chats.expire_chat(self.chat_id, 60000)
+
+        self.assertFalse(expired)
+        self.assertEqual(last_modified + 60000, deadline)
+        self.assertFalse(self.chats.is_expired(self.chat_id))
+        self.assertEqual(1, len(self.chats.get_utterances(self.chat_id)))
+
+    def test_expire_chat_after_deadline(self):
+        expired, deadline = self.chats.expire_chat(self.chat_id, 0)
+
+        self.assertTrue(expired)
+        self.assertIsNone(deadline)
+        self.assertTrue(self.chats.is_expired(self.chat_id))
+
+        chat_id, is_new, _ = self.chats.current_chat(True, True)
+        self.assertEqual(self.chat_id, chat_id)
+        self.assertFalse(is_new)
+
+        with self.assertRaises(ValueError):
+            self.chats.get_utterances(self.chat_id)
+        with self.assertRaises(ValueError):
+            self.chats.append(Utterance.for_chat(self.chat_id, "speaker", timestamp_now(), "too late"))
+
+        self.assertEqual((False, None), self.chats.expire_chat(self.chat_id, 0))
+
+    def test_stop_expired_chat(self):
+        self.chats.expire_chat(self.chat_id, 0)
+        self.chats.stop_chat()
+
+        self.assertFalse(self.chats.is_expired(self.chat_id))
+        self.assertEqual((None, False, None), self.chats.current_chat(False))
+
+        chat_id, is_new, _ = self.chats.current_chat(True)
+        self.assertNotEqual(self.chat_id, chat_id)
+        self.assertTrue(is_new)
+        self.assertFalse(self.chats.is_expired(chat_id))
+
+    def test_expire_and_stop_chat(self):
+        expired, _ = self.chats.expire_chat(self.chat_id, 0, stop=True)
+
+        self.assertTrue(expired)
+        self.assertFalse(self.chats.is_expired(self.chat_id))
+        self.assertEqual((None, False, None), self.chats.current_chat(False))
+
+
+class MemoryChatsUpdateTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.chats = MemoryChats()
+        self.chat_id, _, _ = self.chats.current_chat(True)
+
+    def test_update_streamed_utterance(self):
+        self.chats.update(Utterance.for_chat(self.chat_id, "agent", 1, "Hel", id="signal"))
+        self.chats.update(Utterance.for_chat(self.chat_id, "agent", 1, "lo", id="signal"))
+        utterance = self.chats.update(Utterance.for_chat(self.chat_id, "agent", 1, "Hello!", id="signal"),
+                                      replace=True)
+
+        self.assertEqual("Hello!", utterance.text)
+        self.assertEqual(3, utterance.revision)
+        self.assertEqual([utterance], self.chats.get_utterances(self.chat_id))
+
+        deltas = self.chats.get_updates(self.chat_id)
+        self.assertEqual([(3, 0, "Hello!")], [(delta.revision, delta.offset, delta.text) for delta in deltas])
+        self.assertEqual(0, deltas[0].sequence)
+        self.assertEqual("signal", deltas[0].id)
+
+        deltas = self.chats.get_updates(self.chat_id, from_revision=2)
+        self.assertEqual([3], [delta.revision for delta in deltas])
+        self.assertEqual([], self.chats.get_updates(self.chat_id, from_revision=3))
+
+    def test_update_streamed_utterance_before_final(self):
+        self.chats.update(Utterance.for_chat(self.chat_id, "agent", 1, "Hel", id="signal"))
+        self.chats.update(Utterance.for_chat(self.chat_id, "agent", 1, "lo", id="signal"))
+
+        deltas = self.chats.get_updates(self.chat_id)
+        self.assertEqual([(1, 0, "Hel"), (2, 3, "lo")], [(delta.revision, delta.offset, delta.text) for delta in deltas])
+        self.assertEqual([2], [delta.revision for delta in self.chats.get_updates(self.chat_id, from_revision=1)])
+
+    def test_replace_collapses_only_deltas_of_utterance(self):
+        self.chats.update(Utterance.for_chat(self.chat_id, "agent", 1, "Hel", id="signal"))
+        self.chats.append(Utterance.for_chat(self.chat_id, "speaker", 2, "bla bla bla", id="utterance"))
+        self.chats.update(Utterance.for_chat(self.chat_id, "agent", 1, "lo", id="signal"))
+        self.chats.update(Utterance.for_chat(self.chat_id, "agent", 1, "Hello!", id="signal"), replace=True)
+        self.chats.update(Utterance.for_chat(self.chat_id, "agent", 3, "Bye", id="other"))
+
+        deltas = self.chats.get_updates(self.chat_id)
+        self.assertEqual([(2, "utterance"), (4, "signal"), (5, "other")],
+                         [(delta.revision, delta.id) for delta in deltas])
+        self.assertEqual([4, 5], [delta.revision for delta in self.chats.get_updates(self.chat_id, from_revision=3)])
+
+    def test_update_unknown_utterance_without_create(self):
+        utterance = self.chats.update(Utterance.for_chat(self.chat_id, "agent", 1, "Hello!", id="signal"),
+                                      replace=True, create=False)
+
+        self.assertIsNone(utterance)
+        self.assertEqual([], self.chats.get_utterances(self.chat_id))
+        self.assertEqual([], self.chats.get_updates(self.chat_id))
+
+    def test_append_adds_updates(self):
+        self.chats.append(Utterance.for_chat(self.chat_id, "speaker", 1, "bla bla bla"))
+        self.chats.update(Utterance.for_chat(self.chat_id, "agent", 2, "Hello", id="signal"))
+
+        deltas = self.chats.get_updates(self.chat_id)
+        self.assertEqual([(1, 0, "speaker", 0), (2, 1, "agent", 0)],
+                         [(delta.revision, delta.sequence, delta.speaker, delta.offset) for delta in deltas])
+
+    def test_stop_chat_releases_updates(self):
+        self.chats.update(Utterance.for_chat(self.chat_id, "agent", 1, "Hel", id="signal"))
+        self.chats.stop_chat()
+
+        with self.assertRaises(ValueError):
+            self.chats.get_updates(self.chat_id)
+
+        chat_id, _, _ = self.chats.current_chat(True)
+        utterance = self.chats.update(Utterance.for_chat(chat_id, "agent", 1, "Hi", id="signal"))
+        self.assertEqual("Hi", utterance.text)
+        self.assertEqual(1, utterance.revision)
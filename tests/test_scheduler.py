@@ -0,0 +1,98 @@
+import threading
+import unittest
+from queue import Queue, Empty
+
+from cltl.chatui.scheduler import ExpiryScheduler
+
+
+class ExpirySchedulerTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.now = 1000
+        self.fired = Queue()
+        self.scheduler = None
+
+    def tearDown(self) -> None:
+        if self.scheduler:
+            self.scheduler.stop()
+
+    def create_scheduler(self, callback=None):
+        self.scheduler = ExpiryScheduler(callback if callback else self.fired.put, clock=lambda: self.now)
+
+        return self.scheduler
+
+    def test_keys_fire_in_order_of_deadline(self):
+        scheduler = self.create_scheduler()
+        scheduler.schedule("b", 100)
+        scheduler.schedule("a", 50)
+        scheduler.start()
+
+        self.assertEqual("a", self.fired.get(timeout=5))
+        self.assertEqual("b", self.fired.get(timeout=5))
+
+    def test_key_fires_when_deadline_is_reached(self):
+        scheduler = self.create_scheduler()
+        scheduler.start()
+        scheduler.schedule("a", self.now + 50)
+
+        with self.assertRaises(Empty):
+            self.fired.get(timeout=0.2)
+
+        self.now += 50
+        self.assertEqual("a", self.fired.get(timeout=5))
+
+    def test_earlier_deadline_replaces_later(self):
+        scheduler = self.create_scheduler()
+        scheduler.schedule("a", 500)
+        scheduler.schedule("b", 100)
+        scheduler.schedule("a", 50)
+        scheduler.schedule("c", 900)
+        scheduler.start()
+
+        fired = [self.fired.get(timeout=5) for _ in range(3)]
+
+        self.assertEqual(["a", "b", "c"], fired)
+        scheduler.stop()
+        self.assertTrue(self.fired.empty())
+
+    def test_later_deadline_does_not_replace_pending(self):
+        scheduler = self.create_scheduler()
+        scheduler.schedule("a", 50)
+        scheduler.schedule("a", 500)
+        scheduler.schedule("b", 900)
+        scheduler.start()
+
+        fired = [self.fired.get(timeout=5) for _ in range(2)]
+
+        self.assertEqual(["a", "b"], fired)
+        scheduler.stop()
+        self.assertTrue(self.fired.empty())
+
+    def test_callback_reschedules(self):
+        calls = []
+
+        def callback(key):
+            calls.append(key)
+            self.fired.put(key)
+            return self.now if len(calls) < 3 else None
+
+        scheduler = self.create_scheduler(callback)
+        scheduler.schedule("a", self.now)
+        scheduler.start()
+
+        for _ in range(3):
+            self.assertEqual("a", self.fired.get(timeout=5))
+
+        scheduler.stop()
+        self.assertEqual(["a", "a", "a"], calls)
+
+    def test_stop_while_waiting(self):
+        scheduler = self.create_scheduler()
+        scheduler.start()
+        scheduler.schedule("a", self.now + 3600000)
+
+        stopper = threading.Thread(target=scheduler.stop)
+        stopper.start()
+        stopper.join(timeout=5)
+
+        self.assertFalse(stopper.is_alive())
+        self.assertTrue(self.fired.empty())
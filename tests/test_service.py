@@ -6,11 +6,197 @@ from queue import Queue
 from cltl.combot.infra.event import Event
 from cltl.combot.infra.event.memory import SynchronousEventBus
 from cltl.combot.event.emissor import TextSignalEvent
+from cltl.combot.infra.time_util import timestamp_now
+from emissor.representation.scenario import TextSignal
 
+from cltl.chatui.api import Utterance
 from cltl.chatui.memory import MemoryChats
+from cltl_service.chatui.schema import TextSignalChunkEvent
 from cltl_service.chatui.service import ChatUiService
 
 
+class ChatUiServiceTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.event_bus = SynchronousEventBus()
+        self.chats = MemoryChats()
+        self.service = ChatUiService("testUI", False, "utteranceTopic", ["responseTopic"], "scenarioTopic",
+                                     "desireTopic", 1, self.chats, self.event_bus, None)
+
+        self.desires = Queue()
+        self.event_bus.subscribe("desireTopic", self.desires.put)
+
+    def process_response(self, payload):
+        self.service._process(Event.with_topic(Event.for_payload(payload), "responseTopic"))
+
+    def response(self, text, signal_id=None):
+        signal = TextSignal.for_scenario("scenario", timestamp_now(), timestamp_now(), None, text,
+                                         signal_id=signal_id)
+        return TextSignalEvent.for_agent(signal)
+
+    def chunk(self, text, signal_id):
+        signal = TextSignal.for_scenario("scenario", timestamp_now(), timestamp_now(), None, text,
+                                         signal_id=signal_id)
+        return TextSignalChunkEvent.create(signal)
+
+    def start_timed_out_chat(self):
+        chat_id, _, _ = self.chats.current_chat(True)
+        self.chats.append(Utterance.for_chat(chat_id, "speaker", timestamp_now() - 120000, "bla bla bla"))
+
+        return chat_id
+
+    def test_expire_chat_keeps_chat_until_scenario_stops(self):
+        chat_id = self.start_timed_out_chat()
+
+        self.assertGreater(self.service._expire_chat(chat_id), timestamp_now() - 1000)
+
+        self.assertEqual(["quit"], self.desires.get_nowait().payload.achieved)
+        self.assertTrue(self.chats.is_expired(chat_id))
+        self.assertEqual(chat_id, self.chats.current_chat(False)[0])
+
+    def test_expired_chat_repeats_quit_until_scenario_stops(self):
+        chat_id = self.start_timed_out_chat()
+        self.service._expire_chat(chat_id)
+        self.desires.get_nowait()
+
+        self.assertIsNotNone(self.service._expire_chat(chat_id))
+        self.assertEqual(["quit"], self.desires.get_nowait().payload.achieved)
+
+        self.chats.stop_chat()
+
+        self.assertIsNone(self.service._expire_chat(chat_id))
+        self.assertTrue(self.desires.empty())
+
+    def test_expire_chat_reschedules_active_chat(self):
+        chat_id, _, _ = self.chats.current_chat(True, True)
+        _, _, last_modified = self.chats.current_chat(False)
+
+        self.assertEqual(last_modified + 60000, self.service._expire_chat(chat_id))
+        self.assertTrue(self.desires.empty())
+
+    def test_expire_chat_without_desire_topic_stops_chat(self):
+        self.service = ChatUiService("testUI", False, "utteranceTopic", ["responseTopic"], "scenarioTopic",
+                                     None, 1, self.chats, self.event_bus, None)
+        chat_id = self.start_timed_out_chat()
+
+        self.assertIsNone(self.service._expire_chat(chat_id))
+
+        self.assertFalse(self.chats.is_expired(chat_id))
+        self.assertEqual((None, False, None), self.chats.current_chat(False))
+
+    def test_expired_chat_ignores_responses(self):
+        chat_id = self.start_timed_out_chat()
+        self.service._expire_chat(chat_id)
+
+        self.process_response(self.response("Goodbye"))
+
+        self.assertEqual(chat_id, self.chats.current_chat(False)[0])
+        self.assertTrue(self.chats.is_expired(chat_id))
+
+    def test_streamed_response(self):
+        self.process_response(self.chunk("Hel", "signal"))
+        self.process_response(self.chunk("lo", "signal"))
+        chat_id, _, _ = self.chats.current_chat(False)
+        self.assertEqual("Hello", self.chats.get_utterances(chat_id)[0].text)
+
+        self.process_response(self.response("Hello!", "signal"))
+
+        utterances = self.chats.get_utterances(chat_id)
+        self.assertEqual(1, len(utterances))
+        self.assertEqual("signal", utterances[0].id)
+        self.assertEqual("Hello!", utterances[0].text)
+        self.assertEqual(3, utterances[0].revision)
+
+    def test_response_without_chunks_is_appended(self):
+        self.process_response(self.response("Hello!", "signal"))
+        self.process_response(self.response("Hello again!", "signal"))
+
+        chat_id, _, _ = self.chats.current_chat(False)
+        utterances = self.chats.get_utterances(chat_id)
+        self.assertEqual(["Hello!", "Hello again!"], [utterance.text for utterance in utterances])
+        self.assertTrue(all(utterance.id != "signal" for utterance in utterances))
+        self.assertNotEqual(utterances[0].id, utterances[1].id)
+
+    def test_utterances_filtered_by_revision(self):
+        chat_id, _, _ = self.chats.current_chat(True, True)
+        self.process_response(self.chunk("Hel", "signal"))
+        self.process_response(self.response("Bye", "other"))
+        self.process_response(self.chunk("lo", "signal"))
+
+        with self.service.app.test_client() as client:
+            response = client.get(f'chat/{chat_id}?revision=2')
+            self.assertEqual(200, response.status_code)
+            self.assertEqual([("signal", "Hello", 3)],
+                             [(utterance['id'], utterance['text'], utterance['revision']) for utterance in response.json])
+
+            response = client.get(f'chat/{chat_id}')
+            self.assertEqual(["Hello", "Bye"], [utterance['text'] for utterance in response.json])
+
+    def test_updates_filtered_by_speaker(self):
+        chat_id, _, _ = self.chats.current_chat(True, True)
+        self.chats.append(Utterance.for_chat(chat_id, "speaker", timestamp_now(), "bla bla bla"))
+        self.process_response(self.chunk("Hel", "signal"))
+        self.process_response(self.chunk("lo", "signal"))
+
+        with self.service.app.test_client() as client:
+            response = client.get(f'chat/{chat_id}/updates')
+            self.assertEqual(200, response.status_code)
+            self.assertEqual([(2, "Hel"), (3, "lo")], [(delta['revision'], delta['text']) for delta in response.json])
+            self.assertTrue(all(delta['speaker'] == "Leolani" for delta in response.json))
+
+            response = client.get(f'chat/{chat_id}/updates?speaker=speaker')
+            self.assertEqual(["bla bla bla"], [delta['text'] for delta in response.json])
+
+            response = client.get(f'chat/{chat_id}/updates?revision=2')
+            self.assertEqual([3], [delta['revision'] for delta in response.json])
+
+    def test_updates_unavailable_after_release(self):
+        chat_id, _, _ = self.chats.current_chat(True, True)
+        self.process_response(self.chunk("Hello", "signal"))
+        self.chats.stop_chat()
+
+        with self.service.app.test_client() as client:
+            response = client.get(f'chat/{chat_id}/updates')
+            self.assertEqual(404, response.status_code)
+
+    def test_expired_chat_rejects_visitors(self):
+        chat_id = self.start_timed_out_chat()
+        self.service._expire_chat(chat_id)
+
+        with self.service.app.test_client() as client:
+            client.set_cookie("cltl.chatui.chatid", chat_id)
+            response = client.get('chat/current')
+            self.assertEqual(307, response.status_code)
+            self.assertEqual(1, response.json)
+
+            response = client.get(f'chat/{chat_id}')
+            self.assertEqual(404, response.status_code)
+
+    def expire_on_append(self, chat_id):
+        append = self.chats.append
+
+        def expire_and_append(*args, **kwargs):
+            self.chats.expire_chat(chat_id, 0)
+            append(*args, **kwargs)
+
+        self.chats.append = expire_and_append
+
+    def test_post_to_chat_expired_concurrently(self):
+        chat_id = self.start_timed_out_chat()
+        self.expire_on_append(chat_id)
+
+        with self.service.app.test_client() as client:
+            response = client.post(f'chat/{chat_id}?speaker=speaker', data="bla bla bla")
+            self.assertEqual(404, response.status_code)
+
+    def test_event_for_chat_expired_concurrently(self):
+        chat_id = self.start_timed_out_chat()
+        self.expire_on_append(chat_id)
+
+        self.process_response(self.response("Goodbye"))
+
+        self.assertTrue(self.chats.is_expired(chat_id))
+
+
 class ChatUITest(unittest.TestCase):
     def setUp(self) -> None:
         self.service = None